@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import CustomUser, DeletionJob
+from .deletion import deletion_progress
 from django.contrib.auth.admin import UserAdmin
 
 class CustomUserAdmin(UserAdmin):
@@ -20,3 +21,15 @@ class CustomUserAdmin(UserAdmin):
     ordering = ('email',)
 
 admin.site.register(CustomUser, CustomUserAdmin)
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('target', 'object_id', 'status', 'rows_processed', 'rows_remaining', 'created_at', 'finished_at')
+    list_filter = ('target', 'status')
+
+    @admin.display(description='Rows remaining')
+    def rows_remaining(self, obj):
+        if obj.status != 'running':
+            return 0
+        return deletion_progress(obj)['rows_remaining']
+
+admin.site.register(DeletionJob, DeletionJobAdmin)
@@ -0,0 +1,220 @@
+import json
+from collections import Counter
+from functools import wraps
+
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_http_methods
+
+from . import counters
+from .claims import update_status
+from .forms import ComplaintForm, TestimonialForm
+from .models import Complaint, Zone, Testimonial, ComplaintAssignment, COMPLAINT_STATUS, COMPLAINT_PRIORITY
+from .tasks import notify
+from .throttling import charge
+
+# Resource -> (fields a client may select, fields returned when ?fields= is absent)
+COMPLAINT_FIELDS = (
+    {'id', 'title', 'description', 'location', 'latitude', 'longitude', 'status', 'priority', 'version',
+     'zone_id', 'zone__name', 'citizen_id', 'created_at', 'updated_at'},
+    ['id', 'title', 'status', 'zone__name', 'created_at', 'updated_at'],
+)
+ZONE_FIELDS = (
+    {'id', 'name', 'description', 'open_count', 'in_progress_count', 'resolved_count'},
+    ['id', 'name'],
+)
+TESTIMONIAL_FIELDS = (
+    {'id', 'user__name', 'content', 'rating', 'created_at'},
+    ['id', 'user__name', 'content', 'rating'],
+)
+ASSIGNMENT_FIELDS = (
+    {'id', 'complaint_id', 'complaint__title', 'complaint__status', 'officer_id', 'officer__name', 'assigned_at'},
+    ['id', 'complaint_id', 'officer_id', 'assigned_at'],
+)
+
+MAX_PAGE_SIZE = 100
+# Each complaint in a batch counts as one request against the api_complaints rate, so keep this within it
+MAX_BATCH_SIZE = 20
+
+
+class ApiError(Exception):
+    def __init__(self, error, status=400, headers=None):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+        self.headers = headers or {}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'separators': (',', ':')})
+
+
+def api_view(*methods):
+    """Login and method checks, gzip, and ApiError -> JSON error response for an API view."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return _json({'error': "Authentication required"}, status=401)
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                response = _json({'error': exc.error}, status=exc.status)
+                for header, value in exc.headers.items():
+                    response[header] = value
+                return response
+        return gzip_page(require_http_methods(methods)(wrapper))
+    return decorator
+
+
+def _fields(request, spec):
+    allowed, default = spec
+    requested = request.GET.get('fields')
+    if not requested:
+        return default
+    fields = [f for f in requested.split(',') if f]
+    unknown = set(fields) - allowed
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def _page(request, queryset):
+    try:
+        limit = max(min(int(request.GET.get('limit', 20)), MAX_PAGE_SIZE), 0)
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        raise ApiError("limit and offset must be integers")
+    return list(queryset[offset:offset + limit])
+
+
+def _body(request, allow_list=False):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError("Request body must be JSON")
+    if not isinstance(data, dict) and not (allow_list and isinstance(data, list)):
+        raise ApiError("Request body must be a JSON object")
+    return data
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} must be an integer")
+
+
+def _complaints_for(user):
+    if user.role == 'admin':
+        return Complaint.objects.all()
+    if user.role == 'officer':
+        return Complaint.objects.filter(complaintassignment__officer=user)
+    return Complaint.objects.filter(citizen=user)
+
+
+@api_view('GET', 'POST')
+def complaints(request):
+    if request.method == 'POST':
+        return _lodge_complaints(request)
+    queryset = _complaints_for(request.user)
+    if request.GET.get('status'):
+        queryset = queryset.filter(status=request.GET['status'])
+    if request.GET.get('zone'):
+        queryset = queryset.filter(zone_id=_int(request.GET['zone'], 'zone'))
+    rows = _page(request, queryset.order_by('-created_at').values(*_fields(request, COMPLAINT_FIELDS)))
+    return _json({'results': rows})
+
+
+def _lodge_complaints(request):
+    items = _body(request, allow_list=True)
+    if isinstance(items, dict):
+        items = items.get('complaints', [items])
+    if not isinstance(items, list) or not items:
+        raise ApiError("Send a complaint object or a list of complaints")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ApiError(f"At most {MAX_BATCH_SIZE} complaints per request")
+    retry_after = charge(request, 'api_complaints', len(items))
+    if retry_after:
+        raise ApiError("Too many requests. Please try again later.", status=429,
+                       headers={'Retry-After': str(retry_after)})
+
+    new, errors = [], {}
+    for i, item in enumerate(items):
+        form = ComplaintForm(data=item if isinstance(item, dict) else {})
+        if form.is_valid():
+            complaint = form.save(commit=False)
+            complaint.citizen = request.user
+            new.append(complaint)
+        else:
+            errors[i] = form.errors.get_json_data()
+    if errors:
+        raise ApiError(errors)
+
+    # One transaction for the whole batch; the complaints are all or nothing
+    with transaction.atomic():
+        for complaint in new:
+            complaint.save()
+        for zone_id, n in Counter(c.zone_id for c in new).items():
+            counters.complaint_created(zone_id, count=n)
+    return _json({'ids': [c.id for c in new]}, status=201)
+
+
+@api_view('GET', 'POST')
+def complaint_detail(request, complaint_id):
+    complaint = get_object_or_404(_complaints_for(request.user), id=complaint_id)
+    if request.method == 'GET':
+        row = Complaint.objects.filter(id=complaint.id).values(*_fields(request, COMPLAINT_FIELDS)).get()
+        return _json(row)
+
+    if request.user.role not in ('officer', 'admin'):
+        raise ApiError("Only officers and admins can update complaints", status=403)
+    data = _body(request)
+    status = data.get('status', complaint.status)
+    if status not in dict(COMPLAINT_STATUS):
+        raise ApiError(f"status must be one of: {', '.join(dict(COMPLAINT_STATUS))}")
+    priority = data.get('priority', complaint.priority)
+    if priority not in dict(COMPLAINT_PRIORITY):
+        raise ApiError(f"priority must be one of: {', '.join(str(p) for p in dict(COMPLAINT_PRIORITY))}")
+    old_status = complaint.status
+    version = _int(data.get('version', complaint.version), 'version')
+    if not update_status(complaint, old_status, status, version, priority=priority):
+        raise ApiError("Complaint was changed by someone else", status=409)
+    if status != old_status:
+        notify(complaint.citizen_id, f"Your complaint '{complaint.title}' is now {status}.")
+    row = Complaint.objects.filter(id=complaint.id).values('id', 'status', 'priority', 'version', 'updated_at').get()
+    return _json(row)
+
+
+@api_view('GET')
+def zones(request):
+    queryset = Zone.objects.filter(deleted_at__isnull=True).order_by('name')
+    return _json({'results': _page(request, queryset.values(*_fields(request, ZONE_FIELDS)))})
+
+
+@api_view('GET', 'POST')
+def testimonials(request):
+    if request.method == 'POST':
+        form = TestimonialForm(data=_body(request))
+        if not form.is_valid():
+            raise ApiError(form.errors.get_json_data())
+        testimonial = form.save(commit=False)
+        testimonial.user = request.user
+        testimonial.save()
+        return _json({'id': testimonial.id}, status=201)
+    queryset = Testimonial.objects.filter(is_approved=True).order_by('-created_at')
+    return _json({'results': _page(request, queryset.values(*_fields(request, TESTIMONIAL_FIELDS)))})
+
+
+@api_view('GET')
+def assignments(request):
+    if request.user.role == 'admin':
+        queryset = ComplaintAssignment.objects.all()
+    elif request.user.role == 'officer':
+        queryset = ComplaintAssignment.objects.filter(officer=request.user)
+    else:
+        raise ApiError("Only officers and admins can list assignments", status=403)
+    queryset = queryset.order_by('-assigned_at')
+    return _json({'results': _page(request, queryset.values(*_fields(request, ASSIGNMENT_FIELDS)))})
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import counters
+from .models import Complaint, ComplaintAssignment, Contact, ArchivedComplaint, ArchivedContact, \
+    ComplaintArchiveSummary
+
+
+def complaint_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_COMPLAINT_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def contact_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_CONTACT_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def _bump_summary(month, zone_name, status, count, assigned):
+    updated = ComplaintArchiveSummary.objects.filter(month=month, zone_name=zone_name, status=status).update(
+        count=F('count') + count, assigned=F('assigned') + assigned)
+    if not updated:
+        ComplaintArchiveSummary.objects.create(month=month, zone_name=zone_name, status=status,
+                                               count=count, assigned=assigned)
+
+
+def archive_complaint_batch(cutoff, batch_size=500):
+    # Copy, summarise and delete in one transaction so an interrupted run can simply be restarted
+    with transaction.atomic():
+        # Age counts from resolution, the last status write, so newly resolved complaints stay live for a while
+        ids = list(Complaint.objects.filter(status='Resolved', updated_at__lt=cutoff)
+                   .order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        batch = Complaint.objects.filter(id__in=ids)
+        ArchivedComplaint.objects.bulk_create([
+            ArchivedComplaint(
+                original_id=row['id'],
+                citizen_id=row['citizen_id'],
+                zone_name=row['zone__name'] or '',
+                officer_name=row['complaintassignment__officer__name'] or '',
+                title=row['title'],
+                description=row['description'],
+                photo=row['photo'] or '',
+                location=row['location'],
+                latitude=row['latitude'],
+                longitude=row['longitude'],
+                status=row['status'],
+                priority=row['priority'],
+                created_at=row['created_at'],
+            )
+            for row in batch.values('id', 'citizen_id', 'zone__name', 'complaintassignment__officer__name', 'title',
+                                    'description', 'photo', 'location', 'latitude', 'longitude', 'status',
+                                    'priority', 'created_at')
+        ], ignore_conflicts=True)
+
+        summary = batch.annotate(month=TruncMonth('created_at')).values('month', 'zone__name', 'status') \
+            .annotate(count=Count('id'), assigned=Count('complaintassignment'))
+        for row in summary:
+            _bump_summary(row['month'], row['zone__name'] or '', row['status'], row['count'], row['assigned'])
+
+        counters.complaints_removed(batch)
+        ComplaintAssignment.objects.filter(complaint_id__in=ids).delete()
+        batch.delete()
+    return len(ids)
+
+
+def archived_complaints_removed(archived):
+    """Take a queryset of archived complaints that is about to be deleted out of the summaries."""
+    rows = archived.annotate(month=TruncMonth('created_at')).values('month', 'zone_name', 'status') \
+        .annotate(count=Count('id'), assigned=Count('id', filter=~Q(officer_name='')))
+    for row in rows.order_by():
+        ComplaintArchiveSummary.objects.filter(month=row['month'], zone_name=row['zone_name'],
+                                               status=row['status']).update(
+            count=F('count') - row['count'], assigned=F('assigned') - row['assigned'])
+    ComplaintArchiveSummary.objects.filter(count=0).delete()
+
+
+def archive_contact_batch(cutoff, batch_size=500):
+    with transaction.atomic():
+        batch = list(Contact.objects.filter(submitted_at__lt=cutoff).order_by('id')[:batch_size])
+        if not batch:
+            return 0
+        ArchivedContact.objects.bulk_create([
+            ArchivedContact(original_id=c.id, name=c.name, email=c.email, message=c.message,
+                            submitted_at=c.submitted_at)
+            for c in batch
+        ], ignore_conflicts=True)
+        Contact.objects.filter(id__in=[c.id for c in batch]).delete()
+    return len(batch)
+
+
+def with_archived(rows, field, label, summary_field, **summary_filter):
+    """Add archived counts to live ``values(field).annotate(label=...)`` rows."""
+    totals = {row[field]: row[label] for row in rows}
+    archived = ComplaintArchiveSummary.objects.filter(**summary_filter).values_list(summary_field) \
+        .annotate(n=Sum('count')).order_by()
+    for key, n in archived:
+        key = key or None
+        totals[key] = totals.get(key, 0) + n
+    return [{field: key, label: n} for key, n in totals.items()]
+
+
+def archived_totals(**summary_filter):
+    totals = ComplaintArchiveSummary.objects.filter(**summary_filter).aggregate(count=Sum('count'),
+                                                                                 assigned=Sum('assigned'))
+    return totals['count'] or 0, totals['assigned'] or 0
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CustomUser
+
+# Fields kept in the cached snapshot, in model order as from_db() expects; anything else
+# is loaded lazily on first access
+SNAPSHOT_FIELDS = tuple(
+    f.attname for f in CustomUser._meta.concrete_fields
+    if f.attname in ('id', 'name', 'email', 'role', 'is_active', 'is_staff', 'is_superuser')
+)
+
+
+def _cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that serves request.user from a cached snapshot instead of a query per request."""
+
+    def get_user(self, user_id):
+        snapshot = cache.get(_cache_key(user_id))
+        if snapshot is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                snapshot = [getattr(user, field) for field in SNAPSHOT_FIELDS] + [user.get_session_auth_hash()]
+                cache.set(_cache_key(user_id), snapshot, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+            return user
+
+        user = CustomUser.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, snapshot[:-1])
+        # Lets session verification skip loading the password hash
+        user.cached_session_hash = snapshot[-1]
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
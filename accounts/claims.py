@@ -0,0 +1,97 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import counters
+from .models import Complaint, ComplaintAssignment
+
+# How many candidates the optimistic fallback tries before re-reading the queue
+CLAIM_WINDOW = 10
+# How many times the optimistic fallback re-reads the queue before giving up
+CLAIM_ATTEMPTS = 5
+
+
+class AlreadyAssigned(Exception):
+    pass
+
+
+def create_assignment(complaint_id, officer):
+    """Create the assignment, raising AlreadyAssigned rather than IntegrityError if one exists."""
+    try:
+        with transaction.atomic():
+            return ComplaintAssignment.objects.create(complaint_id=complaint_id, officer=officer)
+    except IntegrityError:
+        raise AlreadyAssigned
+
+
+def pending_queue(zone_id=None):
+    pending = Complaint.objects.filter(status='Pending', complaintassignment__isnull=True)
+    if zone_id:
+        pending = pending.filter(zone_id=zone_id)
+    return pending.order_by('-priority', 'created_at')
+
+
+def claim_next_complaint(officer, zone_id=None):
+    """Assign the next unclaimed pending complaint to ``officer`` and return it, or None."""
+    if connection.features.has_select_for_update_skip_locked:
+        return _claim_skip_locked(officer, zone_id)
+    return _claim_optimistic(officer, zone_id)
+
+
+def _claim_skip_locked(officer, zone_id):
+    for _ in range(CLAIM_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                queue = pending_queue(zone_id)
+                if connection.features.has_select_for_update_of:
+                    queue = queue.select_for_update(skip_locked=True, of=('self',))
+                else:
+                    queue = queue.select_for_update(skip_locked=True)
+                complaint = queue.first()
+                if complaint is None:
+                    return None
+                counters.status_changed(complaint.id, complaint.zone_id, 'Pending', 'In Progress')
+                create_assignment(complaint.id, officer)
+                counters.officer_assigned(officer.id, 'In Progress')
+                Complaint.objects.filter(id=complaint.id).update(status='In Progress', version=F('version') + 1,
+                                                                 updated_at=timezone.now())
+        except AlreadyAssigned:
+            # Assigned by hand since the queue was read; the next read no longer returns it
+            continue
+        complaint.refresh_from_db()
+        return complaint
+    return None
+
+
+def _claim_optimistic(officer, zone_id):
+    for _ in range(CLAIM_ATTEMPTS):
+        candidates = list(pending_queue(zone_id).values_list('id', 'zone_id', 'version')[:CLAIM_WINDOW])
+        if not candidates:
+            return None
+        for complaint_id, complaint_zone_id, version in candidates:
+            try:
+                with transaction.atomic():
+                    # Losing the race just moves us on to the next candidate
+                    won = Complaint.objects.filter(id=complaint_id, version=version, status='Pending').update(
+                        status='In Progress', version=F('version') + 1, updated_at=timezone.now())
+                    if not won:
+                        continue
+                    counters.status_changed(complaint_id, complaint_zone_id, 'Pending', 'In Progress')
+                    create_assignment(complaint_id, officer)
+                    counters.officer_assigned(officer.id, 'In Progress')
+            except AlreadyAssigned:
+                continue
+            return Complaint.objects.get(id=complaint_id)
+    return None
+
+
+def update_status(complaint, old_status, status, expected_version, priority=None):
+    """Write ``status`` only if nobody changed the complaint since ``expected_version`` was read."""
+    updates = {'status': status, 'version': F('version') + 1, 'updated_at': timezone.now()}
+    if priority is not None:
+        updates['priority'] = priority
+    with transaction.atomic():
+        if not Complaint.objects.filter(id=complaint.id, version=expected_version).update(**updates):
+            return False
+        counters.status_changed(complaint.id, complaint.zone_id, old_status, status)
+    return True
@@ -0,0 +1,88 @@
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Zone, CustomUser, Complaint, ComplaintAssignment
+
+# Complaint status -> Zone counter column
+STATUS_FIELDS = {
+    'Pending': 'open_count',
+    'In Progress': 'in_progress_count',
+    'Resolved': 'resolved_count',
+}
+
+# Call these inside the transaction that performs the write they describe
+
+
+def _minus(field, n):
+    # Stops at zero: a drifted counter must not fail the write it describes; reconcile() repairs it
+    return Greatest(F(field), n) - n
+
+
+def complaint_created(zone_id, status='Pending', count=1):
+    if zone_id:
+        field = STATUS_FIELDS[status]
+        Zone.objects.filter(id=zone_id).update(**{field: F(field) + count})
+
+
+def status_changed(complaint_id, zone_id, old_status, new_status):
+    if old_status == new_status:
+        return
+    if zone_id:
+        old_field, new_field = STATUS_FIELDS[old_status], STATUS_FIELDS[new_status]
+        Zone.objects.filter(id=zone_id).update(**{old_field: _minus(old_field, 1), new_field: F(new_field) + 1})
+    if 'Resolved' in (old_status, new_status):
+        if new_status == 'Resolved':
+            load = _minus('active_assignments', 1)
+        else:
+            load = F('active_assignments') + 1
+        CustomUser.objects.filter(complaintassignment__complaint_id=complaint_id).update(active_assignments=load)
+
+
+def officer_assigned(officer_id, status):
+    if status != 'Resolved':
+        CustomUser.objects.filter(id=officer_id).update(active_assignments=F('active_assignments') + 1)
+
+
+def assignments_removed(assignments):
+    active = assignments.exclude(complaint__status='Resolved').values_list('officer_id').annotate(n=Count('id'))
+    for officer_id, n in active.order_by():
+        CustomUser.objects.filter(id=officer_id).update(active_assignments=_minus('active_assignments', n))
+
+
+def zones_cleared(complaints):
+    """Decrement zone counters for a queryset of complaints about to leave their zone."""
+    by_zone = complaints.filter(zone__isnull=False).values_list('zone_id', 'status').annotate(n=Count('id'))
+    for zone_id, status, n in by_zone.order_by():
+        field = STATUS_FIELDS[status]
+        Zone.objects.filter(id=zone_id).update(**{field: _minus(field, n)})
+
+
+def complaints_removed(complaints):
+    """Decrement counters for a queryset of complaints that is about to be deleted."""
+    assignments_removed(ComplaintAssignment.objects.filter(complaint__in=complaints))
+    zones_cleared(complaints)
+
+
+def reconcile():
+    """Recompute every counter from the live tables and fix rows that drifted. Returns rows fixed."""
+    fixed = 0
+
+    zone_counts = {}
+    by_zone = Complaint.objects.filter(zone__isnull=False).values_list('zone_id', 'status').annotate(n=Count('id'))
+    for zone_id, status, n in by_zone.order_by():
+        zone_counts.setdefault(zone_id, {})[STATUS_FIELDS[status]] = n
+    for zone in Zone.objects.only('id', *STATUS_FIELDS.values()):
+        expected = {field: zone_counts.get(zone.id, {}).get(field, 0) for field in STATUS_FIELDS.values()}
+        if any(getattr(zone, field) != n for field, n in expected.items()):
+            Zone.objects.filter(id=zone.id).update(**expected)
+            fixed += 1
+
+    loads = dict(ComplaintAssignment.objects.exclude(complaint__status='Resolved')
+                 .values_list('officer_id').annotate(n=Count('id')).order_by())
+    users = CustomUser.objects.filter(Q(active_assignments__gt=0) | Q(id__in=loads)).only('id', 'active_assignments')
+    for user in users:
+        expected = loads.get(user.id, 0)
+        if user.active_assignments != expected:
+            CustomUser.objects.filter(id=user.id).update(active_assignments=expected)
+            fixed += 1
+    return fixed
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CustomUser, Zone, Complaint, ComplaintAssignment, Testimonial, DeletionJob, ArchivedComplaint
+from . import archive, counters
+from .backends import invalidate_user
+from .tasks import enqueue, task
+
+TARGET_MODELS = {'user': CustomUser, 'zone': Zone}
+
+
+def _batch_size():
+    return getattr(settings, 'DELETION_BATCH_SIZE', 500)
+
+
+def _steps(job):
+    # (queryset, updates) pairs run in order; updates=None means delete the rows
+    if job.target == 'user':
+        return [
+            (ComplaintAssignment.objects.filter(complaint__citizen_id=job.object_id), None),
+            (ComplaintAssignment.objects.filter(officer_id=job.object_id), None),
+            (Complaint.objects.filter(citizen_id=job.object_id), None),
+            (Testimonial.objects.filter(user_id=job.object_id), None),
+            (ArchivedComplaint.objects.filter(citizen_id=job.object_id), None),
+        ]
+    return [
+        (Complaint.objects.filter(zone_id=job.object_id), {'zone': None}),
+    ]
+
+
+def schedule_deletion(target, object_id):
+    """Soft-delete the object now and queue removal of its dependents in batches."""
+    model = TARGET_MODELS[target]
+    updates = {'deleted_at': timezone.now()}
+    if target == 'user':
+        updates['is_active'] = False
+    with transaction.atomic():
+        if not model.objects.filter(id=object_id, deleted_at__isnull=True).update(**updates):
+            return None
+        job = DeletionJob.objects.create(target=target, object_id=object_id)
+    if target == 'user':
+        invalidate_user(object_id)
+    _enqueue_step(job)
+    return job
+
+
+def _enqueue_step(job):
+    enqueue('purge', {'job': job.id}, idempotency_key=f'purge:{job.id}:{job.rows_processed}')
+
+
+def deletion_progress(job):
+    return {
+        'status': job.status,
+        'rows_processed': job.rows_processed,
+        'rows_remaining': sum(qs.count() for qs, _ in _steps(job)),
+    }
+
+
+def _purge_failed(payload):
+    # The object stays soft-deleted; a failed job is left for an admin to look at
+    DeletionJob.objects.filter(id=payload['job'], status='running').update(status='failed', finished_at=timezone.now())
+
+
+@task('purge', on_failure=_purge_failed)
+def purge_batch(payload):
+    job = DeletionJob.objects.filter(id=payload['job'], status='running').first()
+    if job is None:
+        return
+    # Each run touches at most one batch of rows, then re-queues itself
+    for queryset, updates in _steps(job):
+        ids = list(queryset.values_list('id', flat=True)[:_batch_size()])
+        if not ids:
+            continue
+        with transaction.atomic():
+            batch = queryset.model.objects.filter(id__in=ids)
+            if updates is None:
+                if queryset.model is Complaint:
+                    counters.complaints_removed(batch)
+                elif queryset.model is ComplaintAssignment:
+                    counters.assignments_removed(batch)
+                elif queryset.model is ArchivedComplaint:
+                    archive.archived_complaints_removed(batch)
+                batch.delete()
+            else:
+                # Only zone deletion clears a column; the complaints and their assignments stay
+                counters.zones_cleared(batch)
+                batch.update(**updates)
+            job.rows_processed += len(ids)
+            job.save(update_fields=['rows_processed'])
+        _enqueue_step(job)
+        return
+
+    with transaction.atomic():
+        TARGET_MODELS[job.target].objects.filter(id=job.object_id).delete()
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at'])
@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.shortcuts import redirect, render
 
-from .models import CustomUser, Complaint, Testimonial
+from .models import CustomUser, Complaint, Testimonial, Zone
 from django.core.exceptions import ValidationError
 
 class RegisterForm(forms.ModelForm):
@@ -73,6 +73,10 @@ class ComplaintForm(forms.ModelForm):
             'longitude': forms.HiddenInput(),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['zone'].queryset = Zone.objects.filter(deleted_at__isnull=True)
+
 class TestimonialForm(forms.ModelForm):
     class Meta:
         model = Testimonial
@@ -84,15 +88,18 @@ class TestimonialForm(forms.ModelForm):
 
 class OfficerAssignForm(forms.Form):
     officer = forms.ModelChoiceField(
-        queryset=CustomUser.objects.filter(role='officer'),
+        queryset=CustomUser.objects.filter(role='officer', deleted_at__isnull=True),
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
 class ComplaintStatusForm(forms.ModelForm):
     class Meta:
         model = Complaint
-        fields = ['status']
+        fields = ['status', 'priority', 'version']
         widgets = {
-            'status': forms.Select(attrs={'class': 'form-select'})
+            'status': forms.Select(attrs={'class': 'form-select'}),
+            'priority': forms.Select(attrs={'class': 'form-select'}),
+            # Version the officer loaded the form at; a stale one is rejected on submit
+            'version': forms.HiddenInput(),
         }
 
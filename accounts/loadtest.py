@@ -0,0 +1,249 @@
+import json
+import math
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from .models import CustomUser, Zone
+
+PASSWORD = 'LoadTest!2024'
+
+
+def _allowed_host():
+    # The test client's default 'testserver' is only allowed under the test runner
+    for host in settings.ALLOWED_HOSTS:
+        return 'testserver' if host == '*' else host.lstrip('.')
+    # With DEBUG on, an empty ALLOWED_HOSTS still accepts localhost
+    return 'localhost'
+
+
+class InProcessSession:
+    """Drives the Django WSGI handler in this process, one cookie jar per virtual user."""
+
+    def __init__(self, ip):
+        # A distinct REMOTE_ADDR per virtual user keeps the per-IP throttle from skewing results
+        self.client = Client(REMOTE_ADDR=ip, HTTP_HOST=_allowed_host())
+
+    def request(self, method, path, data=None):
+        if method == 'GET':
+            response = self.client.get(path, data)
+        else:
+            response = self.client.post(path, data)
+        return response.status_code, response.get('Location', ''), response.content
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Talks to a running server (e.g. ``manage.py runserver``) over HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def _csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body, headers = None, {}
+        if method == 'GET' and data:
+            url += '?' + urlencode(data)
+        elif method == 'POST':
+            data = dict(data or {})
+            token = self._csrf_token()
+            if token:
+                data['csrfmiddlewaretoken'] = token
+                headers = {'X-CSRFToken': token, 'Referer': url}
+            body = urlencode(data).encode()
+        try:
+            with self.opener.open(Request(url, data=body, method=method, headers=headers), timeout=30) as response:
+                return response.status, '', response.read()
+        except HTTPError as exc:
+            return exc.code, exc.headers.get('Location', ''), exc.read()
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []  # (route, seconds, ok); list.append is atomic under the GIL
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, seconds, ok in self.samples:
+            routes.setdefault(route, []).append((seconds, ok))
+        routes['ALL'] = [(seconds, ok) for _, seconds, ok in self.samples]
+        return {route: _stats(samples, elapsed) for route, samples in routes.items() if samples}
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _stats(samples, elapsed):
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'requests': len(samples),
+        'rps': len(samples) / elapsed if elapsed else 0.0,
+        'error_rate': errors / len(samples),
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'p99': _percentile(latencies, 99),
+    }
+
+
+class VirtualUser:
+    def __init__(self, role, session, recorder):
+        self.role = role
+        self.session = session
+        self.recorder = recorder
+        self.email = f'loadtest-{uuid.uuid4().hex[:12]}@example.com'
+        self.officer_ids = []
+
+    def call(self, route, method='GET', kwargs=None, data=None, redirect=None):
+        """GETs must return 200 and POSTs must redirect, to ``redirect`` if given and never to the login page."""
+        path = reverse(route, kwargs=kwargs)
+        start = time.perf_counter()
+        try:
+            status, location, body = self.session.request(method, path, data)
+            if method == 'GET':
+                good = status == 200
+            else:
+                # Unauthenticated requests redirect to login, and failed forms re-render with 200
+                target = urlsplit(location).path
+                expected = target == reverse(redirect) if redirect else target != reverse('login')
+                good = status == 302 and expected
+        except Exception:
+            status, location, body, good = 0, '', b'', False
+        self.recorder.samples.append((route, time.perf_counter() - start, good))
+        return status, location, body
+
+    def setup(self):
+        self.call('register')  # sets the CSRF cookie when talking HTTP
+        self.call('register', 'POST', redirect='login', data={
+            'name': f'Load {self.role}', 'email': self.email, 'phone': f'9{random.randint(0, 10 ** 9 - 1):09d}',
+            'aadhaar': f'{random.randint(10 ** 11, 10 ** 12 - 1)}', 'role': self.role,
+            'password': PASSWORD, 'confirm_password': PASSWORD,
+        })
+        self.call('login', 'POST', redirect='dashboard', data={'email': self.email, 'password': PASSWORD})
+
+    def iteration(self, zone_ids):
+        getattr(self, f'{self.role}_iteration')(zone_ids)
+
+    def citizen_iteration(self, zone_ids):
+        self.call('lodge_complaint', 'POST', redirect='dashboard', data={
+            'zone': random.choice(zone_ids), 'title': 'Load test complaint', 'description': 'Streetlight out',
+            'location': 'Main road', 'latitude': 12.97, 'longitude': 77.59,
+        })
+        self.call('view_complaint_status')
+        self.call('dashboard')
+
+    def officer_iteration(self, zone_ids):
+        self.call('officer_assigned_complaints')
+        self.call('officer_assigned_complaints', data={'status': 'In Progress', 'q': 'Load'})
+        status, location, _ = self.call('claim_complaint', 'POST')
+        # A successful claim redirects to update_complaint_status/<id>/
+        complaint_id = location.rstrip('/').rsplit('/', 1)[-1]
+        if status == 302 and complaint_id.isdigit():
+            _, _, body = self.call('api_complaint', kwargs={'complaint_id': complaint_id},
+                                   data={'fields': 'version,priority'})
+            try:
+                form = json.loads(body)
+            except ValueError:
+                return
+            self.call('update_complaint_status', 'POST', kwargs={'complaint_id': complaint_id},
+                      redirect='officer_assigned_complaints', data={'status': 'Resolved', **form})
+
+    def admin_iteration(self, zone_ids):
+        self.call('admin_view_complaints', data={'q': 'Load'})
+        self.call('complaint_analytics')
+        _, _, body = self.call('api_complaints', data={'status': 'Pending', 'fields': 'id', 'limit': 20})
+        try:
+            pending = [row['id'] for row in json.loads(body)['results']]
+        except (ValueError, KeyError, TypeError):
+            pending = []
+        if not self.officer_ids:
+            self.officer_ids = list(CustomUser.objects.filter(
+                role='officer', email__startswith='loadtest-').values_list('id', flat=True)[:50])
+        if pending and self.officer_ids:
+            self.call('assign_officer', 'POST', kwargs={'complaint_id': random.choice(pending)},
+                      redirect='admin_view_complaints', data={'officer': random.choice(self.officer_ids)})
+
+
+def parse_mix(mix):
+    """'citizen=70,officer=20,admin=10' -> {'citizen': 70, ...}"""
+    weights = {}
+    for part in mix.split(','):
+        role, _, weight = part.partition('=')
+        weights[role.strip()] = int(weight)
+    return weights
+
+
+def _roles(concurrency, weights):
+    # Spread roles across virtual users as evenly as the weights allow
+    total = sum(weights.values())
+    roles, assigned = [], {role: 0 for role in weights}
+    for i in range(concurrency):
+        role = max(weights, key=lambda r: weights[r] * (i + 1) / total - assigned[r])
+        assigned[role] += 1
+        roles.append(role)
+    return roles
+
+
+def run(concurrency, duration, weights, base_url=None):
+    """Run ``concurrency`` virtual users for ``duration`` seconds. Returns per-route stats."""
+    zone_ids = list(Zone.objects.filter(deleted_at__isnull=True).values_list('id', flat=True)[:20])
+    if not zone_ids:
+        zone_ids = [Zone.objects.get_or_create(name='Load test zone')[0].id]
+
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def worker(index, role):
+        if base_url:
+            session = HttpSession(base_url)
+        else:
+            session = InProcessSession(f'10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}')
+        user = VirtualUser(role, session, recorder)
+        try:
+            user.setup()
+            while time.monotonic() < deadline:
+                user.iteration(zone_ids)
+        finally:
+            connections.close_all()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency), _roles(concurrency, weights)))
+    return recorder.summary(time.monotonic() - started)
+
+
+def find_breaking_point(p99_target_ms, duration, weights, base_url=None, max_concurrency=64, report=None):
+    """Double concurrency until overall p99 exceeds the target; returns (last_ok, breaking, results)."""
+    results, last_ok, concurrency = {}, 0, 1
+    while concurrency <= max_concurrency:
+        stats = run(concurrency, duration, weights, base_url)
+        results[concurrency] = stats
+        if report:
+            report(concurrency, stats)
+        if stats['ALL']['p99'] > p99_target_ms:
+            return last_ok, concurrency, results
+        last_ok = concurrency
+        concurrency *= 2
+    return last_ok, None, results
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from accounts.archive import archive_complaint_batch, archive_contact_batch, complaint_cutoff, contact_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move old resolved complaints and contact messages into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complaint-days', type=int, help="Archive complaints resolved more than this many days ago")
+        parser.add_argument('--contact-days', type=int, help="Archive contact messages older than this")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        jobs = (
+            ('complaints', archive_complaint_batch, complaint_cutoff(options['complaint_days'])),
+            ('contacts', archive_contact_batch, contact_cutoff(options['contact_days'])),
+        )
+        for label, archive_batch, cutoff in jobs:
+            total = 0
+            while True:
+                moved = archive_batch(cutoff, batch_size)
+                if not moved:
+                    break
+                total += moved
+            self.stdout.write(f"Archived {total} {label}")
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.loadtest import find_breaking_point, parse_mix, run
+
+
+class Command(BaseCommand):
+    help = ("Simulate citizens, officers and admins against the portal and report throughput, error rate "
+            "and latency per route. Creates real users and complaints, so point it at a development database, "
+            "and raise THROTTLE_RATES first or the write throttle will show up as errors.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help="Server to load, e.g. http://127.0.0.1:8000 (default: in-process)")
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=30, help="Seconds per run")
+        parser.add_argument('--mix', default='citizen=70,officer=20,admin=10')
+        parser.add_argument('--p99-target', type=float, help="Find the concurrency where p99 (ms) exceeds this")
+        parser.add_argument('--max-concurrency', type=int, default=64)
+
+    def handle(self, *args, **options):
+        try:
+            weights = parse_mix(options['mix'])
+        except ValueError:
+            raise CommandError("--mix must look like citizen=70,officer=20,admin=10")
+        unknown = set(weights) - {'citizen', 'officer', 'admin'}
+        if unknown or not any(weights.values()):
+            raise CommandError(f"Invalid --mix roles: {', '.join(sorted(unknown)) or 'all weights are zero'}")
+
+        if options['p99_target'] is None:
+            stats = run(options['concurrency'], options['duration'], weights, options['base_url'])
+            self.print_table(stats)
+            return
+
+        last_ok, breaking, _ = find_breaking_point(
+            options['p99_target'], options['duration'], weights, options['base_url'],
+            options['max_concurrency'], report=self.print_step)
+        if breaking is None:
+            self.stdout.write(f"p99 stayed under {options['p99_target']:.0f} ms up to concurrency {last_ok}")
+        else:
+            self.stdout.write(f"p99 exceeded {options['p99_target']:.0f} ms at concurrency {breaking} "
+                              f"(last passing: {last_ok})")
+
+    def print_step(self, concurrency, stats):
+        self.stdout.write(f"\nConcurrency {concurrency}")
+        self.print_table(stats)
+
+    def print_table(self, stats):
+        self.stdout.write(f"{'route':32} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for route in sorted(stats, key=lambda r: (r == 'ALL', r)):
+            s = stats[route]
+            self.stdout.write(f"{route:32} {s['requests']:7d} {s['rps']:8.1f} {s['error_rate'] * 100:6.1f} "
+                              f"{s['p50']:8.1f} {s['p95']:8.1f} {s['p99']:8.1f}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-zone and per-officer workload counters and fix any drift"
+
+    def handle(self, *args, **options):
+        fixed = reconcile()
+        self.stdout.write(f"Fixed {fixed} counter row(s)")
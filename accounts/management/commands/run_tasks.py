@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = "Process queued background tasks (notifications and other post-write work)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process due tasks once and exit")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending(limit=options['batch_size'])
+            if processed:
+                self.stdout.write(f"Processed {processed} task(s)")
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
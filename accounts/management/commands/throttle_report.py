@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from accounts.throttling import throttled_callers
+
+
+class Command(BaseCommand):
+    help = "List callers currently rejected by the write throttle"
+
+    def handle(self, *args, **options):
+        blocked = throttled_callers()
+        if not blocked:
+            self.stdout.write("No callers are throttled")
+        for _, info in sorted(blocked.items()):
+            until = datetime.fromtimestamp(info['until']).strftime('%H:%M:%S')
+            self.stdout.write(f"{info['ident']}  {info['url_name']}  until {until}")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2),
+        ),
+        migrations.AddField(
+            model_name='complaint',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['status', 'zone', '-priority', 'created_at'], name='accounts_co_status_65560f_idx'),
+        ),
+    ]
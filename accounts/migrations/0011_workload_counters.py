@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+STATUS_FIELDS = {'Pending': 'open_count', 'In Progress': 'in_progress_count', 'Resolved': 'resolved_count'}
+
+
+def populate_counters(apps, schema_editor):
+    Zone = apps.get_model('accounts', 'Zone')
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Complaint = apps.get_model('accounts', 'Complaint')
+    ComplaintAssignment = apps.get_model('accounts', 'ComplaintAssignment')
+
+    by_zone = Complaint.objects.filter(zone__isnull=False).values_list('zone_id', 'status').annotate(n=Count('id'))
+    for zone_id, status, n in by_zone.order_by():
+        Zone.objects.filter(id=zone_id).update(**{STATUS_FIELDS[status]: n})
+
+    loads = ComplaintAssignment.objects.exclude(complaint__status='Resolved').values_list('officer_id') \
+        .annotate(n=Count('id'))
+    for officer_id, n in loads.order_by():
+        CustomUser.objects.filter(id=officer_id).update(active_assignments=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_archive'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='active_assignments',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='in_progress_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='open_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='resolved_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'active_assignments'], name='accounts_cu_role_93957e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['open_count'], name='accounts_zo_open_co_29ad9b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['in_progress_count'], name='accounts_zo_in_prog_64dcfb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='zone',
+            index=models.Index(fields=['resolved_count'], name='accounts_zo_resolve_846bf9_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_workload_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
+from django.utils import timezone
 
 ROLES = (
     ('citizen', 'Citizen'),
@@ -41,18 +42,47 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     role = models.CharField(max_length=10, choices=ROLES)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)  # set when a deletion job is scheduled
+    active_assignments = models.PositiveIntegerField(default=0)  # maintained by accounts.counters
 
     objects = CustomUserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name', 'phone', 'aadhaar']
 
+    class Meta:
+        indexes = [models.Index(fields=['role', 'active_assignments'])]
+
     def __str__(self):
         return self.email
 
+    def get_session_auth_hash(self):
+        # Users rebuilt from the auth cache carry the hash instead of the password
+        cached = getattr(self, 'cached_session_hash', None)
+        if cached and 'password' in self.get_deferred_fields():
+            return cached
+        return super().get_session_auth_hash()
+
 class Zone(models.Model):
-    name = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # Complaint counts by status, maintained by accounts.counters
+    open_count = models.PositiveIntegerField(default=0)
+    in_progress_count = models.PositiveIntegerField(default=0)
+    resolved_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['open_count']),
+            models.Index(fields=['in_progress_count']),
+            models.Index(fields=['resolved_count']),
+        ]
+        constraints = [
+            # A soft-deleted zone gives its name up straight away rather than after the purge
+            models.UniqueConstraint(fields=['name'], condition=models.Q(deleted_at__isnull=True),
+                                    name='unique_live_zone_name'),
+        ]
 
     def __str__(self):
         return self.name
@@ -63,6 +93,12 @@ COMPLAINT_STATUS = (
     ('Resolved', 'Resolved'),
 )
 
+COMPLAINT_PRIORITY = (
+    (1, 'Low'),
+    (2, 'Medium'),
+    (3, 'High'),
+)
+
 class Complaint(models.Model):
     citizen = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     zone = models.ForeignKey(Zone, on_delete=models.SET_NULL, null=True)  # ✅ Add this line
@@ -73,7 +109,13 @@ class Complaint(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
     status = models.CharField(max_length=20, choices=COMPLAINT_STATUS, default='Pending')
+    priority = models.PositiveSmallIntegerField(choices=COMPLAINT_PRIORITY, default=2)
+    version = models.PositiveIntegerField(default=0)  # bumped on every claim/status write for optimistic locking
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # queryset .update() calls must set this themselves
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'zone', '-priority', 'created_at'])]
 
     def __str__(self):
         return f"{self.title} - {self.citizen.name}"
@@ -111,3 +153,101 @@ class Contact(models.Model):
     def __str__(self):
         return f"{self.name} - {self.email}"
 
+
+
+TASK_STATUS = (
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+)
+
+class Task(models.Model):
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    group_key = models.CharField(max_length=100, blank=True)  # tasks sharing name + group_key run as one batch
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=TASK_STATUS, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)  # lease start while running
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+DELETION_TARGETS = (
+    ('user', 'User'),
+    ('zone', 'Zone'),
+)
+
+DELETION_STATUS = (
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+)
+
+class DeletionJob(models.Model):
+    target = models.CharField(max_length=10, choices=DELETION_TARGETS)
+    object_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=DELETION_STATUS, default='running')
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Delete {self.target} #{self.object_id} ({self.status})"
+
+
+class ArchivedComplaint(models.Model):
+    original_id = models.PositiveBigIntegerField(unique=True)
+    citizen = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    zone_name = models.CharField(max_length=100, blank=True)
+    officer_name = models.CharField(max_length=100, blank=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    photo = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=255)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    status = models.CharField(max_length=20, choices=COMPLAINT_STATUS)
+    priority = models.PositiveSmallIntegerField(choices=COMPLAINT_PRIORITY)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['citizen', '-created_at'])]
+
+    def __str__(self):
+        return f"{self.title} (archived)"
+
+class ComplaintArchiveSummary(models.Model):
+    # Pre-aggregated counts of archived complaints so analytics stay correct
+    month = models.DateTimeField()
+    zone_name = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=COMPLAINT_STATUS)
+    count = models.PositiveIntegerField(default=0)
+    assigned = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('month', 'zone_name', 'status')
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.zone_name} {self.status}: {self.count}"
+
+class ArchivedContact(models.Model):
+    original_id = models.PositiveBigIntegerField(unique=True)
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    message = models.TextField()
+    submitted_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.email} (archived)"
@@ -0,0 +1,134 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task, CustomUser
+
+logger = logging.getLogger(__name__)
+
+# name -> (handler, batch). Batch handlers get a list of payloads sharing a group_key.
+HANDLERS = {}
+# name -> callback(payload), run once a task has used up its attempts
+FAILURE_HANDLERS = {}
+
+
+def task(name, batch=False, on_failure=None):
+    def decorator(func):
+        HANDLERS[name] = (func, batch)
+        if on_failure:
+            FAILURE_HANDLERS[name] = on_failure
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, group_key='', idempotency_key=None, delay=0):
+    # A single INSERT; a duplicate idempotency_key is silently ignored.
+    Task.objects.bulk_create([Task(
+        name=name,
+        payload=payload or {},
+        group_key=group_key,
+        idempotency_key=idempotency_key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+def notify(user_id, message, idempotency_key=None):
+    enqueue('notify', {'recipient': user_id, 'message': message},
+            group_key=str(user_id), idempotency_key=idempotency_key)
+
+
+def _claim(task_ids):
+    claimed = []
+    for task_id in task_ids:
+        # Conditional UPDATE so two workers never run the same task
+        if Task.objects.filter(id=task_id, status='queued').update(
+                status='running', attempts=F('attempts') + 1, started_at=timezone.now()):
+            claimed.append(task_id)
+    return claimed
+
+
+def requeue_stale():
+    """Requeue tasks whose worker died mid-run; the expired lease counts as a failed attempt."""
+    lease = timedelta(seconds=getattr(settings, 'TASK_LEASE_SECONDS', 600))
+    stale = Task.objects.filter(status='running', started_at__lt=timezone.now() - lease)
+    requeued = 0
+    for t in stale.only('id', 'name', 'payload', 'attempts', 'max_attempts', 'started_at'):
+        if t.attempts >= t.max_attempts:
+            updates = {'status': 'failed'}
+        else:
+            updates = {'status': 'queued', 'run_at': timezone.now() + _retry_delay(t.attempts)}
+        # Matching started_at skips tasks another worker already requeued and reclaimed
+        if Task.objects.filter(id=t.id, status='running', started_at=t.started_at).update(
+                last_error="Lease expired before the task finished", **updates):
+            requeued += 1
+            if updates['status'] == 'failed':
+                _gave_up(t)
+    return requeued
+
+
+def _gave_up(t):
+    on_failure = FAILURE_HANDLERS.get(t.name)
+    if on_failure is None:
+        return
+    try:
+        on_failure(t.payload)
+    except Exception:
+        logger.exception("Failure handler for task %s failed", t.name)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'TASK_RETRY_BACKOFF', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def run_pending(limit=100):
+    requeue_stale()
+    due = Task.objects.filter(status='queued', run_at__lte=timezone.now()).order_by('run_at')
+    groups = {}
+    for task_id, name, group_key in due.values_list('id', 'name', 'group_key')[:limit]:
+        batch = HANDLERS.get(name, (None, False))[1]
+        groups.setdefault((name, group_key if batch else task_id), []).append(task_id)
+
+    processed = 0
+    for (name, _), task_ids in groups.items():
+        claimed = _claim(task_ids)
+        if not claimed:
+            continue
+        tasks = list(Task.objects.filter(id__in=claimed).order_by('id'))
+        processed += len(tasks)
+        try:
+            func, batch = HANDLERS[name]
+            if batch:
+                func([t.payload for t in tasks])
+            else:
+                func(tasks[0].payload)
+        except Exception as exc:
+            logger.exception("Task %s failed", name)
+            for t in tasks:
+                t.last_error = repr(exc)
+                if t.attempts >= t.max_attempts:
+                    t.status = 'failed'
+                else:
+                    t.status = 'queued'
+                    t.run_at = timezone.now() + _retry_delay(t.attempts)
+            Task.objects.bulk_update(tasks, ['status', 'run_at', 'last_error'])
+            for t in tasks:
+                if t.status == 'failed':
+                    _gave_up(t)
+        else:
+            Task.objects.filter(id__in=claimed).update(status='done', last_error='')
+    return processed
+
+
+@task('notify', batch=True)
+def send_notifications(payloads):
+    email = CustomUser.objects.filter(id=payloads[0]['recipient']).values_list('email', flat=True).first()
+    if not email:
+        return
+    subject = "Smart City Portal: 1 update" if len(payloads) == 1 else f"Smart City Portal: {len(payloads)} updates"
+    body = "\n\n".join(p['message'] for p in payloads)
+    send_mail(subject, body, None, [email])
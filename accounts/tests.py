@@ -1,3 +1,466 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import counters
+from .backends import SNAPSHOT_FIELDS, CachedModelBackend, _cache_key
+from .archive import archive_complaint_batch, archived_totals, complaint_cutoff
+from .claims import AlreadyAssigned, claim_next_complaint, create_assignment, pending_queue
+from .deletion import schedule_deletion
+from .loadtest import InProcessSession, Recorder, VirtualUser, _percentile, _roles, find_breaking_point, parse_mix
+from .models import CustomUser, Task, Zone, Complaint, ComplaintAssignment, ArchivedComplaint, Contact
+from .tasks import notify, run_pending
+from .throttling import hit, throttled_callers
+
+
+def make_user(role, n):
+    return CustomUser.objects.create_user(f'{role}{n}@example.com', f'{role} {n}', '9876543210',
+                                          f'{n:012d}', role, 'password123')
+
+
+def make_complaint(citizen, zone=None, **kwargs):
+    # Goes through the counters like the views do, so workload columns stay consistent
+    complaint = Complaint.objects.create(citizen=citizen, zone=zone, title='Pothole', description='Deep pothole',
+                                         location='Main road', latitude=12.9, longitude=77.5, **kwargs)
+    counters.complaint_created(complaint.zone_id, complaint.status)
+    return complaint
+
+
+@override_settings(AUTHENTICATION_BACKENDS=['accounts.backends.CachedModelBackend'])
+class CachedBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('citizen', 1)
+        self.backend = CachedModelBackend()
+
+    def test_cache_hit_needs_no_queries(self):
+        expected_hash = self.user.get_session_auth_hash()
+        self.backend.get_user(self.user.id)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.id)
+            self.assertEqual((user.role, user.name, user.email), ('citizen', 'citizen 1', 'citizen1@example.com'))
+            self.assertEqual(user.get_session_auth_hash(), expected_hash)
+
+    def test_inactive_snapshot_is_rejected(self):
+        self.backend.get_user(self.user.id)
+        snapshot = cache.get(_cache_key(self.user.id))
+        snapshot[SNAPSHOT_FIELDS.index('is_active')] = False
+        cache.set(_cache_key(self.user.id), snapshot)
+        self.assertIsNone(self.backend.get_user(self.user.id))
+
+    def test_profile_edit_invalidates(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('profile_view'), {'name': 'Renamed', 'phone': '9876543210'})
+        self.assertIsNone(cache.get(_cache_key(self.user.id)))
+        self.assertEqual(self.backend.get_user(self.user.id).name, 'Renamed')
+
+    def test_password_change_invalidates(self):
+        self.client.force_login(self.user)
+        self.backend.get_user(self.user.id)
+        self.client.post(reverse('change_password_view'), {
+            'old_password': 'password123', 'new_password1': 'N3w-password!', 'new_password2': 'N3w-password!'})
+        self.assertIsNone(cache.get(_cache_key(self.user.id)))
+        self.user.refresh_from_db()
+        self.assertEqual(self.backend.get_user(self.user.id).get_session_auth_hash(),
+                         self.user.get_session_auth_hash())
+
+    def test_deletion_invalidates(self):
+        self.backend.get_user(self.user.id)
+        schedule_deletion('user', self.user.id)
+        self.assertIsNone(cache.get(_cache_key(self.user.id)))
+        self.assertIsNone(self.backend.get_user(self.user.id))
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.user = make_user('citizen', 1)
+
+    def test_notifications_are_batched_per_recipient(self):
+        notify(self.user.id, "first")
+        notify(self.user.id, "second")
+        notify(self.user.id, "duplicate", idempotency_key='k')
+        notify(self.user.id, "duplicate", idempotency_key='k')
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "Smart City Portal: 3 updates")
+
+    def test_stale_running_task_is_requeued_as_failed_attempt(self):
+        notify(self.user.id, "hello")
+        Task.objects.update(status='running', attempts=1, started_at=timezone.now() - timedelta(hours=1))
+        run_pending()
+        task = Task.objects.get()
+        self.assertEqual(task.status, 'queued')
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.run_at, timezone.now())
+
+    def test_stale_task_fails_after_max_attempts(self):
+        notify(self.user.id, "hello")
+        Task.objects.update(status='running', attempts=5, started_at=timezone.now() - timedelta(hours=1))
+        run_pending()
+        self.assertEqual(Task.objects.get().status, 'failed')
+
+
+class ClaimTests(TestCase):
+    def setUp(self):
+        self.citizen = make_user('citizen', 1)
+        self.officer = make_user('officer', 2)
+        self.zone_a = Zone.objects.create(name='A')
+        self.zone_b = Zone.objects.create(name='B')
+
+    def test_claims_distinct_complaints_in_priority_order(self):
+        low = make_complaint(self.citizen, self.zone_a, priority=1)
+        high = make_complaint(self.citizen, self.zone_b, priority=3)
+        medium = make_complaint(self.citizen, self.zone_a)
+        claimed = [claim_next_complaint(self.officer) for _ in range(4)]
+        self.assertEqual([c and c.id for c in claimed], [high.id, medium.id, low.id, None])
+        self.assertEqual(ComplaintAssignment.objects.filter(officer=self.officer).count(), 3)
+        self.assertTrue(all(c.status == 'In Progress' for c in claimed[:3]))
+
+    def test_zone_filter(self):
+        make_complaint(self.citizen, self.zone_a, priority=3)
+        in_b = make_complaint(self.citizen, self.zone_b)
+        self.assertEqual(claim_next_complaint(self.officer, zone_id=self.zone_b.id).id, in_b.id)
+        self.assertIsNone(claim_next_complaint(self.officer, zone_id=self.zone_b.id))
+
+    def test_lost_race_without_zone_filter_moves_on(self):
+        taken = make_complaint(self.citizen, self.zone_a, priority=3)
+        free = make_complaint(self.citizen, self.zone_b)
+        stale = [(taken.id, taken.zone_id, taken.version)]
+        # Another officer claims the first candidate between our read and our write
+        Complaint.objects.filter(id=taken.id).update(status='In Progress', version=1)
+        counters.status_changed(taken.id, taken.zone_id, 'Pending', 'In Progress')
+        queues = iter([mock.Mock(values_list=mock.Mock(return_value=stale))])
+        # SQLite has no SKIP LOCKED, so this exercises the optimistic path
+        with mock.patch('accounts.claims.pending_queue', lambda zone_id: next(queues, None) or pending_queue(zone_id)):
+            claimed = claim_next_complaint(self.officer)
+        self.assertEqual(claimed.id, free.id)
+        self.assertEqual(claimed.zone_id, self.zone_b.id)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_drifted_counter_does_not_block_claims(self):
+        complaint = make_complaint(self.citizen, self.zone_a)
+        Zone.objects.filter(id=self.zone_a.id).update(open_count=0)
+        self.assertEqual(claim_next_complaint(self.officer).id, complaint.id)
+        self.zone_a.refresh_from_db()
+        self.assertEqual((self.zone_a.open_count, self.zone_a.in_progress_count), (0, 1))
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_skip_locked_path_retries_after_assignment_conflict(self):
+        complaint = make_complaint(self.citizen, self.zone_a)
+        conflicts = iter([AlreadyAssigned])
+
+        def assign(complaint_id, officer):
+            # The first attempt loses to a concurrent manual assignment
+            for exc in conflicts:
+                raise exc
+            return create_assignment(complaint_id, officer)
+
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True), \
+                mock.patch('accounts.claims.create_assignment', assign):
+            self.assertEqual(claim_next_complaint(self.officer).id, complaint.id)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_claim_view(self):
+        complaint = make_complaint(self.citizen, self.zone_a)
+        url = reverse('claim_complaint')
+        self.client.force_login(self.citizen)
+        self.client.post(url)
+        self.assertFalse(ComplaintAssignment.objects.exists())
+        self.client.force_login(self.officer)
+        self.client.post(url, {'zone': 'abc'})
+        self.assertFalse(ComplaintAssignment.objects.exists())
+        self.client.post(url, {'zone': self.zone_a.id})
+        self.assertEqual(ComplaintAssignment.objects.get().complaint_id, complaint.id)
+        run_pending()
+        self.assertEqual(mail.outbox[0].to, [self.citizen.email])
+
+    def test_stale_status_form_is_rejected(self):
+        complaint = make_complaint(self.citizen, self.zone_a)
+        url = reverse('update_complaint_status', kwargs={'complaint_id': complaint.id})
+        self.client.post(url, {'status': 'In Progress', 'priority': 3, 'version': 0})
+        # A second officer who loaded the form at version 0 must not overwrite the first
+        self.client.post(url, {'status': 'Resolved', 'priority': 1, 'version': 0})
+        complaint.refresh_from_db()
+        self.assertEqual((complaint.status, complaint.priority, complaint.version), ('In Progress', 3, 1))
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.citizen = make_user('citizen', 1)
+        self.officer = make_user('officer', 2)
+        self.admin = make_user('admin', 3)
+        self.zone = Zone.objects.create(name='A')
+        self.complaint = make_complaint(self.citizen, self.zone)
+
+    def assign(self, complaint):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('assign_officer', kwargs={'complaint_id': complaint.id}), {'officer': self.officer.id})
+
+    def test_assign_resolve_and_archive_keep_counters_exact(self):
+        self.assign(self.complaint)
+        self.officer.refresh_from_db()
+        self.assertEqual(self.officer.active_assignments, 1)
+        self.client.post(reverse('update_complaint_status', kwargs={'complaint_id': self.complaint.id}),
+                         {'status': 'Resolved', 'priority': 2, 'version': 1})
+        self.officer.refresh_from_db()
+        self.assertEqual(self.officer.active_assignments, 0)
+        self.assertEqual(counters.reconcile(), 0)
+        Complaint.objects.update(created_at=timezone.now() - timedelta(days=400),
+                                 updated_at=timezone.now() - timedelta(days=400))
+        archive_complaint_batch(complaint_cutoff())
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.open_count, self.zone.resolved_count), (0, 0))
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_assigning_twice_is_rejected_without_touching_counters(self):
+        self.assign(self.complaint)
+        other = make_user('officer', 4)
+        self.client.post(reverse('assign_officer', kwargs={'complaint_id': self.complaint.id}), {'officer': other.id})
+        self.assertEqual(ComplaintAssignment.objects.get().officer_id, self.officer.id)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_status_update_survives_counter_drift(self):
+        # Created behind the counters' back, so the zone's open_count is one short
+        drifted = Complaint.objects.create(citizen=self.citizen, zone=self.zone, title='Leak', description='Pipe',
+                                           location='Main road', latitude=12.9, longitude=77.5)
+        Zone.objects.filter(id=self.zone.id).update(open_count=0)
+        self.client.force_login(self.officer)
+        self.client.post(reverse('update_complaint_status', kwargs={'complaint_id': drifted.id}),
+                         {'status': 'Resolved', 'priority': 2, 'version': 0})
+        drifted.refresh_from_db()
+        self.assertEqual(drifted.status, 'Resolved')
+        self.assertEqual(counters.reconcile(), 1)
+        self.zone.refresh_from_db()
+        self.assertEqual((self.zone.open_count, self.zone.resolved_count), (1, 1))
+
+    def test_zone_deletion_keeps_officer_workload(self):
+        self.assign(self.complaint)
+        schedule_deletion('zone', self.zone.id)
+        while run_pending():
+            pass
+        self.complaint.refresh_from_db()
+        self.officer.refresh_from_db()
+        self.assertIsNone(self.complaint.zone_id)
+        self.assertEqual(self.officer.active_assignments, 1)
+        self.assertEqual(counters.reconcile(), 0)
+
+
+class DeletionTests(TestCase):
+    def setUp(self):
+        self.citizen = make_user('citizen', 1)
+        self.zone = Zone.objects.create(name='A')
+        for _ in range(5):
+            make_complaint(self.citizen, self.zone)
+
+    @override_settings(DELETION_BATCH_SIZE=2)
+    def test_user_purge_runs_in_bounded_batches(self):
+        job = schedule_deletion('user', self.citizen.id)
+        processed = [0]
+        while run_pending():
+            job.refresh_from_db()
+            processed.append(job.rows_processed)
+        self.assertTrue(all(b - a <= 2 for a, b in zip(processed, processed[1:])))
+        self.assertEqual((job.status, job.rows_processed), ('done', 5))
+        self.assertFalse(CustomUser.objects.filter(id=self.citizen.id).exists())
+
+    def test_purge_that_runs_out_of_attempts_fails_the_job(self):
+        job = schedule_deletion('zone', self.zone.id)
+        Task.objects.update(max_attempts=1)
+        with mock.patch('accounts.deletion._steps', side_effect=RuntimeError):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_deleted_zone_name_can_be_reused_before_the_purge(self):
+        schedule_deletion('zone', self.zone.id)
+        Zone.objects.create(name='A')
+        while run_pending():
+            pass
+        self.assertEqual(Zone.objects.get().name, 'A')
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_deleting_twice_is_reported(self):
+        admin = make_user('admin', 2)
+        self.client.force_login(admin)
+        url = reverse('delete_zone', kwargs={'zone_id': self.zone.id})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual([m.level_tag for m in get_messages(response.wsgi_request)][-1], 'error')
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.citizen = make_user('citizen', 1)
+        self.zone = Zone.objects.create(name='A')
+        make_complaint(self.citizen, self.zone, status='Resolved')
+        make_complaint(self.citizen, self.zone)
+        Complaint.objects.update(created_at=timezone.now() - timedelta(days=400),
+                                 updated_at=timezone.now() - timedelta(days=400))
+
+    def test_archive_moves_resolved_complaints_into_summaries(self):
+        self.assertEqual(archive_complaint_batch(complaint_cutoff()), 1)
+        self.assertEqual(ArchivedComplaint.objects.count(), 1)
+        self.assertEqual(Complaint.objects.count(), 1)
+        self.assertEqual(archived_totals(), (1, 0))
+
+    def test_recently_resolved_complaints_stay_live(self):
+        Complaint.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(archive_complaint_batch(complaint_cutoff()), 0)
+
+    def test_zero_days_is_not_ignored(self):
+        self.assertLess(timezone.now() - complaint_cutoff(0), timedelta(seconds=5))
+
+    def test_user_deletion_removes_archived_counts(self):
+        archive_complaint_batch(complaint_cutoff())
+        schedule_deletion('user', self.citizen.id)
+        while run_pending():
+            pass
+        self.assertFalse(ArchivedComplaint.objects.exists())
+        self.assertEqual(archived_totals(), (0, 0))
+
+
+# Placed as the README says: after sessions and auth, before CSRF
+THROTTLED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.throttling.ThrottleMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+
+@override_settings(MIDDLEWARE=THROTTLED_MIDDLEWARE)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(THROTTLE_RATES={'handle_contact': {'ip': '2/m'}})
+    def test_contact_posts_are_throttled_per_ip(self):
+        data = {'name': 'Bot', 'email': 'bot@example.com', 'message': 'Spam'}
+        codes = [self.client.post(reverse('handle_contact'), data).status_code for _ in range(3)]
+        self.assertEqual(codes, [302, 302, 429])
+        self.assertEqual(Contact.objects.count(), 2)
+        self.assertIn('handle_contact:ip:127.0.0.1', throttled_callers())
+        self.assertEqual(self.client.get(reverse('handle_contact')).status_code, 302)
+
+    def test_limit_holds_across_a_window_boundary(self):
+        with mock.patch('accounts.throttling.time.time', return_value=119.0):
+            self.assertEqual([hit('x', '2/m'), hit('x', '2/m')], [0, 0])
+        with mock.patch('accounts.throttling.time.time', return_value=121.0):
+            self.assertEqual(hit('x', '2/m'), 60)
+            # Two requests against 1/m only slide out by the end of the next window
+            self.assertEqual(hit('z', '1/m', count=2), 120)
+        with mock.patch('accounts.throttling.time.time', return_value=151.0):
+            self.assertEqual(hit('y', '2/m'), 0)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.citizen = make_user('citizen', 1)
+        self.officer = make_user('officer', 2)
+        self.complaint = make_complaint(self.citizen)
+        ComplaintAssignment.objects.create(complaint=self.complaint, officer=self.officer)
+
+    @override_settings(THROTTLE_RATES={'api_complaints': {'user': '3/h'}})
+    def test_batch_lodging_counts_each_complaint(self):
+        zone = Zone.objects.create(name='A')
+        item = {'zone': zone.id, 'title': 'Pothole', 'description': 'Deep pothole', 'location': 'Main road',
+                'latitude': 12.9, 'longitude': 77.5}
+        batch = json.dumps({'complaints': [item, item]})
+        before_auth = [m for m in THROTTLED_MIDDLEWARE if not m.endswith('ThrottleMiddleware')]
+        before_auth.insert(0, 'accounts.throttling.ThrottleMiddleware')
+        # The per-user limit must hold whether or not the middleware ran, and wherever it sits
+        for middleware in (None, THROTTLED_MIDDLEWARE, before_auth):
+            with self.subTest(middleware=middleware), self.settings(MIDDLEWARE=middleware or settings.MIDDLEWARE):
+                cache.clear()
+                Complaint.objects.all().delete()
+                self.client.force_login(self.citizen)
+                responses = [self.client.post(reverse('api_complaints'), batch, content_type='application/json')
+                             for _ in range(2)]
+                self.assertEqual([r.status_code for r in responses], [201, 429])
+                self.assertIn('Retry-After', responses[1])
+                self.assertEqual(Complaint.objects.count(), 2)
+
+    def test_query_parameters_are_validated(self):
+        self.client.force_login(self.citizen)
+        url = reverse('api_complaints')
+        self.assertEqual(self.client.get(url, {'limit': -5}).json(), {'results': []})
+        self.assertEqual(self.client.get(url, {'zone': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+        self.assertEqual(len(self.client.get(url, {'fields': 'id'}).json()['results']), 1)
+
+    def test_bodies_must_be_objects(self):
+        self.client.force_login(self.officer)
+        url = reverse('api_complaint', kwargs={'complaint_id': self.complaint.id})
+        for body in ('[]', '"Resolved"', '{"status": "Resolved", "version": "x"}', '{"priority": 9}'):
+            self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(reverse('api_testimonials'), '[]',
+                                          content_type='application/json').status_code, 400)
+
+    def test_stale_version_conflicts(self):
+        self.client.force_login(self.officer)
+        url = reverse('api_complaint', kwargs={'complaint_id': self.complaint.id})
+        body = json.dumps({'status': 'In Progress', 'version': 0})
+        self.assertEqual(self.client.post(url, body, content_type='application/json').json()['version'], 1)
+        self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 409)
+
+
+class LoadTestTests(TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('citizen=70, officer=20,admin=10'), {'citizen': 70, 'officer': 20, 'admin': 10})
+        with self.assertRaises(ValueError):
+            parse_mix('citizen')
+
+    def test_roles_follow_the_weights(self):
+        roles = _roles(10, {'citizen': 70, 'officer': 20, 'admin': 10})
+        self.assertEqual({r: roles.count(r) for r in set(roles)}, {'citizen': 7, 'officer': 2, 'admin': 1})
+        self.assertEqual(_roles(3, {'citizen': 1, 'admin': 0}), ['citizen'] * 3)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([_percentile(values, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(_percentile([1, 2], 50), 1)
+        self.assertEqual(_percentile([7], 99), 7)
+
+    def test_find_breaking_point(self):
+        def fake_run(concurrency, duration, weights, base_url=None):
+            return {'ALL': {'p99': concurrency * 10.0}}
+
+        reported = []
+        with mock.patch('accounts.loadtest.run', fake_run):
+            last_ok, breaking, results = find_breaking_point(35, 1, {'citizen': 1},
+                                                             report=lambda c, stats: reported.append(c))
+            self.assertEqual((last_ok, breaking, list(results)), (2, 4, [1, 2, 4]))
+            self.assertEqual(reported, [1, 2, 4])
+            self.assertEqual(find_breaking_point(1000, 1, {'citizen': 1}, max_concurrency=8)[:2], (8, None))
+
+    def test_in_process_session_sends_an_allowed_host(self):
+        for hosts in (['.example.com'], ['*']):
+            with self.subTest(hosts=hosts), self.settings(ALLOWED_HOSTS=hosts):
+                status, _, _ = InProcessSession('10.0.0.1').request('GET', reverse('handle_contact'))
+                self.assertEqual(status, 302)
+
+    def test_calls_that_land_on_login_are_errors(self):
+        session = mock.Mock()
+        user = VirtualUser('citizen', session, Recorder())
+        login, dashboard = reverse('login'), reverse('dashboard')
+        session.request.return_value = (302, login + '?next=/dashboard', b'')
+        user.call('lodge_complaint', 'POST')
+        session.request.return_value = (302, dashboard, b'')
+        user.call('lodge_complaint', 'POST', redirect='dashboard')
+        user.call('claim_complaint', 'POST', redirect='officer_assigned_complaints')
+        session.request.return_value = (200, '', b'form errors')
+        user.call('lodge_complaint', 'POST', redirect='dashboard')
+        user.call('dashboard')
+        self.assertEqual([ok for _, _, ok in user.recorder.samples], [False, True, False, False, True])
 
-# Create your tests here.
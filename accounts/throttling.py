@@ -0,0 +1,152 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+# URL name (from accounts/urls.py) -> {scope: 'requests/period'}; override with settings.THROTTLE_RATES
+DEFAULT_THROTTLE_RATES = {
+    'login': {'ip': '10/m'},
+    'register': {'ip': '5/h'},
+    'handle_contact': {'ip': '5/h'},
+    'lodge_complaint': {'ip': '60/h', 'user': '20/h'},
+    'submit_testimonial': {'ip': '20/h', 'user': '5/h'},
+    'api_complaints': {'ip': '60/h', 'user': '20/h'},
+    'api_testimonials': {'ip': '20/h', 'user': '5/h'},
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+BLOCKED_SEQ_KEY = 'throttle:blocked:seq'
+# throttle_report lists at most this many of the most recent rejections
+MAX_BLOCKED_REPORTED = 1000
+
+
+def parse_rate(rate):
+    limit, period = rate.split('/')
+    return int(limit), PERIODS[period[0]]
+
+
+def get_rates(url_name):
+    rates = getattr(settings, 'THROTTLE_RATES', {})
+    return rates.get(url_name, DEFAULT_THROTTLE_RATES.get(url_name))
+
+
+def client_ip(request):
+    header = getattr(settings, 'THROTTLE_IP_HEADER', 'REMOTE_ADDR')
+    return request.META.get(header, '').split(',')[0].strip() or 'unknown'
+
+
+def hit(ident, rate, count=1):
+    """Count ``count`` requests against ``ident``'s rate. Returns seconds to wait if that went over it, else 0."""
+    limit, period = parse_rate(rate)
+    now = time.time()
+    window = int(now // period)
+    key = f'throttle:{ident}:{window}'
+    # One atomic incr per request; the count is kept into the next window, which still weighs it
+    cache.add(key, 0, 2 * period + 1)
+    try:
+        used = cache.incr(key, count)
+    except ValueError:
+        cache.set(key, count, 2 * period + 1)
+        used = count
+    previous = cache.get(f'throttle:{ident}:{window - 1}', 0)
+    # Sliding window: the previous window counts for the share of it still inside the last ``period``
+    # seconds, so a burst either side of a window boundary cannot reach twice the rate
+    overlap = 1 - (now / period - window)
+    if previous * overlap + used <= limit:
+        return 0
+    # How long until one more request would fit, once the counts have slid far enough out
+    if used < limit:
+        wait = period * (overlap - (limit - used - 1) / previous)
+    else:
+        wait = (window + 1) * period - now + period * (1 - (limit - 1) / used)
+    return int(wait) + 1
+
+
+def _record_blocked(ident, url_name, retry_after):
+    until = time.time() + retry_after
+    # Only the first rejection per caller, URL and window is recorded
+    if cache.add(f'throttle:blocked:{url_name}:{ident}', 1, retry_after):
+        # Each record takes its own slot from an atomic counter, so concurrent rejections never overwrite each other
+        cache.add(BLOCKED_SEQ_KEY, 0, None)
+        try:
+            seq = cache.incr(BLOCKED_SEQ_KEY)
+        except ValueError:
+            cache.set(BLOCKED_SEQ_KEY, 1, None)
+            seq = 1
+        cache.set(f'throttle:blocked:slot:{seq % MAX_BLOCKED_REPORTED}',
+                  {'ident': ident, 'url_name': url_name, 'until': until}, retry_after)
+        logger.warning("Throttled %s on %s for %ss", ident, url_name, retry_after)
+
+
+def _idents(request, rates):
+    idents = []
+    if 'ip' in rates:
+        idents.append((f'ip:{client_ip(request)}', rates['ip']))
+    if 'user' in rates and hasattr(request, 'user') and request.user.is_authenticated:
+        idents.append((f'user:{request.user.pk}', rates['user']))
+    return idents
+
+
+def charge(request, url_name, count):
+    """Count a request that does ``count`` units of work against its rates. Returns seconds to wait, or 0."""
+    rates = get_rates(url_name)
+    if not rates:
+        return 0
+    # Whatever the middleware already counted for this request is not counted twice; a missing
+    # middleware, or one placed before auth, leaves the rest to be charged here
+    counted = getattr(request, 'throttle_counted', set())
+    for ident, rate in _idents(request, rates):
+        n = count - (ident in counted)
+        if n < 1:
+            continue
+        retry_after = hit(f'{url_name}:{ident}', rate, n)
+        if retry_after:
+            _record_blocked(ident, url_name, retry_after)
+            return retry_after
+    return 0
+
+
+def throttled_callers():
+    """Callers currently rejected by the throttle, keyed by '<url_name>:<ident>'."""
+    now = time.time()
+    slots = cache.get_many([f'throttle:blocked:slot:{i}' for i in range(MAX_BLOCKED_REPORTED)])
+    return {f"{v['url_name']}:{v['ident']}": v for v in slots.values() if v['until'] > now}
+
+
+class ThrottleMiddleware:
+    """Reject writes to throttled URLs before the view parses the form or touches the ORM."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Decided here rather than in process_view, which runs after CsrfViewMiddleware has read the body
+        return self.throttle(request) or self.get_response(request)
+
+    def throttle(self, request):
+        if request.method != 'POST':
+            return None
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        rates = get_rates(url_name)
+        if not rates:
+            return None
+
+        request.throttle_counted = set()
+        for ident, rate in _idents(request, rates):
+            retry_after = hit(f'{url_name}:{ident}', rate)
+            request.throttle_counted.add(ident)
+            if retry_after:
+                _record_blocked(ident, url_name, retry_after)
+                response = HttpResponse("Too many requests. Please try again later.", status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+        return None
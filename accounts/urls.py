@@ -1,9 +1,10 @@
 from django.urls import path
+from . import api
 from .views import register_view, login_view, dashboard, add_zone, delete_zone, manage_zones, edit_zone, \
     manage_citizens, manage_officers, delete_citizen, delete_officer, change_password_view, profile_view, \
     lodge_complaint, home, handle_contact, manage_contacts, delete_contact, manage_testimonials, delete_testimonial, \
     toggle_approval, submit_testimonial, view_complaint_status, admin_view_complaints, assign_officer, \
-    officer_assigned_complaints, update_complaint_status, complaint_analytics, officer_dashboard_analytics
+    officer_assigned_complaints, update_complaint_status, complaint_analytics, officer_dashboard_analytics, claim_complaint
 
 urlpatterns = [
     path('', home, name='home'),
@@ -34,6 +35,12 @@ urlpatterns = [
     path('assign_officer/<int:complaint_id>/', assign_officer, name='assign_officer'),
     path('officer_assigned_complaints/', officer_assigned_complaints, name='officer_assigned_complaints'),
     path('update_complaint_status/<int:complaint_id>/', update_complaint_status, name='update_complaint_status'),
+    path('claim_complaint/', claim_complaint, name='claim_complaint'),
     path('complaint_analytics/', complaint_analytics, name='complaint_analytics'),
     path('officer_dashboard_analytics', officer_dashboard_analytics, name='officer_dashboard_analytics'),
+    path('api/complaints/', api.complaints, name='api_complaints'),
+    path('api/complaints/<int:complaint_id>/', api.complaint_detail, name='api_complaint'),
+    path('api/zones/', api.zones, name='api_zones'),
+    path('api/testimonials/', api.testimonials, name='api_testimonials'),
+    path('api/assignments/', api.assignments, name='api_assignments'),
 ]
@@ -3,21 +3,27 @@ from datetime import datetime
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db import models
-from django.db.models import Q, Count
+from django.db import models, transaction
+from django.db.models import Q, Count, F
 from django.db.models.functions import TruncMonth
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
 
 from .forms import RegisterForm, LoginForm, CustomPasswordChangeForm, ProfileUpdateForm, ComplaintForm, TestimonialForm, \
     OfficerAssignForm, ComplaintStatusForm
 from django.contrib.auth import authenticate, login, update_session_auth_hash, logout
 
-from .models import Zone, CustomUser, Testimonial, Contact, Complaint, ComplaintAssignment
+from .models import Zone, CustomUser, Testimonial, Contact, Complaint, ComplaintAssignment, ArchivedComplaint
+from .tasks import notify
+from .claims import claim_next_complaint, update_status, create_assignment, AlreadyAssigned
+from .deletion import schedule_deletion
+from .archive import with_archived, archived_totals
+from . import counters
 
 
 def home(request):
     testimonials = Testimonial.objects.filter(is_approved=True).order_by('-created_at')[:6]  # Fetch latest 6 approved
-    zones = Zone.objects.all()
+    zones = Zone.objects.filter(deleted_at__isnull=True)
     return render(request, 'index.html', {'testimonials': testimonials, 'zones': zones})
 
 def register_view(request):
@@ -58,20 +64,41 @@ def dashboard(request):
         return render(request, 'citizen_dashboard.html')
 
 
+# Workload sort options, backed by the indexed counter columns
+ZONE_SORTS = {'open': '-open_count', 'in_progress': '-in_progress_count', 'resolved': '-resolved_count'}
+OFFICER_SORTS = {'busiest': '-active_assignments', 'idlest': 'active_assignments'}
+
+def _int_param(request, name):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else None
+
 def manage_zones(request):
     search_query = request.GET.get('search', '')
-    zones_list = Zone.objects.all()
+    sort = request.GET.get('sort', '')
+    min_open = _int_param(request, 'min_open')
+    zones_list = Zone.objects.filter(deleted_at__isnull=True)
 
 
     if search_query:
         zones_list = zones_list.filter(name__icontains=search_query) | zones_list.filter(
             description__icontains=search_query)
 
+    if min_open is not None:
+        zones_list = zones_list.filter(open_count__gte=min_open)
+
+    if sort in ZONE_SORTS:
+        zones_list = zones_list.order_by(ZONE_SORTS[sort], 'id')
+
     paginator = Paginator(zones_list, 5)
     page_number = request.GET.get('page')
     zones = paginator.get_page(page_number)
 
-    return render(request, 'manage_zones.html', {'zones': zones, 'search_query': search_query})
+    return render(request, 'manage_zones.html', {
+        'zones': zones,
+        'search_query': search_query,
+        'sort': sort,
+        'min_open': min_open,
+    })
 
 def add_zone(request):
     if request.method == "POST":
@@ -85,12 +112,14 @@ def add_zone(request):
     return redirect('manage_zones')
 
 def delete_zone(request, zone_id):
-    Zone.objects.filter(id=zone_id).delete()
-    messages.success(request, 'Zone deleted successfully!')
+    if schedule_deletion('zone', zone_id) is None:
+        messages.error(request, 'Zone not found or already deleted.')
+    else:
+        messages.success(request, 'Zone deleted successfully!')
     return redirect('manage_zones')
 
 def edit_zone(request, id):
-    zone = get_object_or_404(Zone, pk=id)
+    zone = get_object_or_404(Zone, pk=id, deleted_at__isnull=True)
     if request.method == "POST":
         zone.name = request.POST['name']
         zone.description = request.POST['description']
@@ -101,7 +130,7 @@ def edit_zone(request, id):
 def manage_citizens(request):
     search_query = request.GET.get('search', '')
     role_filter = 'citizen'
-    citizens = CustomUser.objects.filter(role=role_filter)
+    citizens = CustomUser.objects.filter(role=role_filter, deleted_at__isnull=True)
 
     if search_query:
         citizens = citizens.filter(
@@ -122,8 +151,10 @@ def manage_citizens(request):
 
 def manage_officers(request):
     search_query = request.GET.get('search', '')
+    sort = request.GET.get('sort', '')
+    max_load = _int_param(request, 'max_load')
     role_filter = 'officer'
-    officers = CustomUser.objects.filter(role=role_filter)
+    officers = CustomUser.objects.filter(role=role_filter, deleted_at__isnull=True)
 
     if search_query:
         officers = officers.filter(
@@ -132,6 +163,12 @@ def manage_officers(request):
             Q(aadhaar__icontains=search_query)
         )
 
+    if max_load is not None:
+        officers = officers.filter(active_assignments__lte=max_load)
+
+    if sort in OFFICER_SORTS:
+        officers = officers.order_by(OFFICER_SORTS[sort], 'id')
+
     paginator = Paginator(officers, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -139,16 +176,22 @@ def manage_officers(request):
     return render(request, 'manage_officers.html', {
         'page_obj': page_obj,
         'search_query': search_query,
+        'sort': sort,
+        'max_load': max_load,
     })
 
 def delete_officer(request, id):
-    CustomUser.objects.filter(id=id).delete()
-    messages.success(request, 'Officer deleted successfully!')
+    if schedule_deletion('user', id) is None:
+        messages.error(request, 'Officer not found or already deleted.')
+    else:
+        messages.success(request, 'Officer deleted successfully!')
     return redirect('manage_officers')
 
 def delete_citizen(request, id):
-    CustomUser.objects.filter(id=id).delete()
-    messages.success(request, 'Citizen deleted successfully!')
+    if schedule_deletion('user', id) is None:
+        messages.error(request, 'Citizen not found or already deleted.')
+    else:
+        messages.success(request, 'Citizen deleted successfully!')
     return redirect('manage_citizens')
 
 @login_required
@@ -188,7 +231,9 @@ def lodge_complaint(request):
         if form.is_valid():
             complaint = form.save(commit=False)
             complaint.citizen = request.user
-            complaint.save()
+            with transaction.atomic():
+                complaint.save()
+                counters.complaint_created(complaint.zone_id)
             messages.success(request, "Complaint lodged successfully.")
             return redirect('dashboard')
     else:
@@ -278,7 +323,11 @@ def submit_testimonial(request):
 
 def view_complaint_status(request):
     user_complaints = Complaint.objects.filter(citizen=request.user).order_by('-created_at')
-    return render(request, 'view_complaint_status.html', {'complaints': user_complaints})
+    context = {'complaints': user_complaints}
+    # Archived complaints are only loaded when the citizen asks for them
+    if request.GET.get('archived'):
+        context['archived_complaints'] = ArchivedComplaint.objects.filter(citizen=request.user).order_by('-created_at')
+    return render(request, 'view_complaint_status.html', context)
 
 def admin_view_complaints(request):
     query = request.GET.get('q', '')
@@ -307,9 +356,21 @@ def assign_officer(request, complaint_id):
         form = OfficerAssignForm(request.POST)
         if form.is_valid():
             officer = form.cleaned_data['officer']
-            ComplaintAssignment.objects.create(complaint=complaint, officer=officer)
-            complaint.status = 'In Progress'
-            complaint.save()
+            try:
+                with transaction.atomic():
+                    old_status = Complaint.objects.select_for_update().values_list('status', flat=True).get(id=complaint.id)
+                    counters.status_changed(complaint.id, complaint.zone_id, old_status, 'In Progress')
+                    create_assignment(complaint.id, officer)
+                    counters.officer_assigned(officer.id, 'In Progress')
+                    Complaint.objects.filter(id=complaint.id).update(status='In Progress', version=F('version') + 1,
+                                                                     updated_at=timezone.now())
+            except AlreadyAssigned:
+                messages.error(request, "This complaint has already been assigned.")
+                return redirect('admin_view_complaints')
+            notify(officer.id, f"Complaint '{complaint.title}' has been assigned to you.",
+                   idempotency_key=f'assign:{complaint.id}:{officer.id}:officer')
+            notify(complaint.citizen_id, f"Your complaint '{complaint.title}' has been assigned to {officer.name}.",
+                   idempotency_key=f'assign:{complaint.id}:{officer.id}:citizen')
             return redirect('admin_view_complaints')
     else:
         form = OfficerAssignForm()
@@ -350,26 +411,57 @@ def officer_assigned_complaints(request):
 
 def update_complaint_status(request, complaint_id):
     complaint = get_object_or_404(Complaint, id=complaint_id)
+    old_status = complaint.status
 
     if request.method == 'POST':
         form = ComplaintStatusForm(request.POST, instance=complaint)
         if form.is_valid():
-            form.save()
+            if not update_status(complaint, old_status, complaint.status, form.cleaned_data['version'],
+                                 priority=complaint.priority):
+                messages.error(request, "This complaint was changed by someone else. Please try again.")
+                return redirect('update_complaint_status', complaint_id=complaint.id)
+            if complaint.status != old_status:
+                notify(complaint.citizen_id, f"Your complaint '{complaint.title}' is now {complaint.status}.")
             return redirect('officer_assigned_complaints')
     else:
         form = ComplaintStatusForm(instance=complaint)
 
     return render(request, 'update_complaint_status.html', {'form': form, 'complaint': complaint})
 
+@login_required
+def claim_complaint(request):
+    if request.method != 'POST':
+        return redirect('officer_assigned_complaints')
+    if request.user.role != 'officer':
+        messages.error(request, "Only officers can claim complaints.")
+        return redirect('dashboard')
+    zone = request.POST.get('zone', '')
+    if zone and not zone.isdigit():
+        messages.error(request, "Invalid zone.")
+        return redirect('officer_assigned_complaints')
+    complaint = claim_next_complaint(request.user, zone_id=int(zone) if zone else None)
+    if complaint is None:
+        messages.info(request, "No pending complaints to claim.")
+        return redirect('officer_assigned_complaints')
+    notify(complaint.citizen_id, f"Your complaint '{complaint.title}' has been assigned to {request.user.name}.",
+           idempotency_key=f'assign:{complaint.id}:{request.user.id}:citizen')
+    messages.success(request, f"Complaint '{complaint.title}' is now assigned to you.")
+    return redirect('update_complaint_status', complaint_id=complaint.id)
+
 def complaint_analytics(request):
     # Count the number of complaints by status
-    complaint_status_counts = Complaint.objects.values('status').annotate(count=Count('status'))
+    complaint_status_counts = with_archived(
+        Complaint.objects.values('status').annotate(count=Count('status')), 'status', 'count', 'status')
 
     # Count complaints by zone
-    complaint_zone_counts = Complaint.objects.values('zone__name').annotate(count=Count('zone'))
+    complaint_zone_counts = with_archived(
+        Complaint.objects.values('zone__name').annotate(count=Count('zone')), 'zone__name', 'count', 'zone_name',
+        zone_name__gt='')
 
     # Monthly complaint counts
-    monthly_complaints = Complaint.objects.annotate(month=TruncMonth('created_at')).values('month').annotate(count=Count('id')).order_by('month')
+    monthly_complaints = sorted(with_archived(
+        Complaint.objects.annotate(month=TruncMonth('created_at')).values('month').annotate(count=Count('id')),
+        'month', 'count', 'month'), key=lambda row: row['month'])
 
     context = {
         'complaint_status_counts': complaint_status_counts,
@@ -380,23 +472,28 @@ def complaint_analytics(request):
 
 def officer_dashboard_analytics(request):
     # Total complaints
-    total_complaints = Complaint.objects.count()
+    archived_count, archived_assigned = archived_totals()
+    total_complaints = Complaint.objects.count() + archived_count
 
     # Complaints by status
-    complaints_by_status = Complaint.objects.values('status').annotate(total=Count('status'))
+    complaints_by_status = with_archived(
+        Complaint.objects.values('status').annotate(total=Count('status')), 'status', 'total', 'status')
 
     # Complaints assigned to officers
-    complaints_assigned = ComplaintAssignment.objects.count()
+    complaints_assigned = ComplaintAssignment.objects.count() + archived_assigned
 
     # Testimonial ratings (average rating)
     avg_rating = Testimonial.objects.aggregate(avg_rating=models.Avg('rating'))['avg_rating']
 
     # Complaints by Zone
-    complaints_by_zone = Complaint.objects.values('zone__name').annotate(total=Count('zone'))
+    complaints_by_zone = with_archived(
+        Complaint.objects.values('zone__name').annotate(total=Count('zone')), 'zone__name', 'total', 'zone_name',
+        zone_name__gt='')
 
     # Complaints by month (time-based statistics)
     current_month = datetime.now().month
-    complaints_by_month = Complaint.objects.filter(created_at__month=current_month).count()
+    complaints_by_month = Complaint.objects.filter(created_at__month=current_month).count() + \
+        archived_totals(month__month=current_month)[0]
 
     # Pass the data to the template
     context = {